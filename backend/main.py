@@ -1,4 +1,5 @@
-from fastapi import FastAPI, HTTPException, Header, Depends, Request
+from fastapi import FastAPI, HTTPException, Header, Depends, Request, Response
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
@@ -7,13 +8,14 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import os
 import logging
-import sys
 
-# Ensure the src directory is in the path so we can import the peoples_court package
-sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
-
-from peoples_court.adjudicator import retrieve_context
-from peoples_court.models import Embedder, Jury
+from peoples_court.adjudicator import (
+    retrieve_context,
+    get_cached_context,
+    cache_context,
+)
+from peoples_court.models import get_embedder, get_jury
+from peoples_court.db import create_pool
 from peoples_court.config import EMBED_MODEL_NAME, JURY_MODEL_ID, JURY_ADAPTER_PATH
 
 INTERNAL_API_KEY = os.getenv("INTERNAL_API_KEY")
@@ -49,12 +51,14 @@ logging.getLogger("httpcore").setLevel(logging.WARNING)
 async def lifespan(app: FastAPI):
     # Load models on startup
     logger.info("Loading models...")
-    app.state.embedder = Embedder(model_id=EMBED_MODEL_NAME)
-    app.state.jury = Jury(model_id=JURY_MODEL_ID, adapter_path=JURY_ADAPTER_PATH)
+    app.state.embedder = get_embedder(EMBED_MODEL_NAME)
+    app.state.jury = get_jury(JURY_MODEL_ID, JURY_ADAPTER_PATH)
     logger.info("Models loaded successfully.")
+    app.state.db_pool = create_pool()
     yield
     # Clean up resources on shutdown
     logger.info("Shutting down...")
+    app.state.db_pool.close()
 
 
 def get_ip(request: Request):
@@ -73,6 +77,8 @@ app = FastAPI(
     description="Adjudicating social conflicts using AITA case law.",
     version="0.1.0",
     lifespan=lifespan,
+    # orjson serializes the precedent payloads considerably faster than stdlib json
+    default_response_class=ORJSONResponse,
 )
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
@@ -101,7 +107,10 @@ async def health_check():
 @app.post("/context")
 @limiter.limit("10/minute")
 async def post_retrieve_context(
-    request: Request, body: AdjudicateRequest, _=Depends(verify_api_key)
+    request: Request,
+    response: Response,
+    body: AdjudicateRequest,
+    _=Depends(verify_api_key),
 ):
     """
     Retrieves the context (precedents and jury consensus) for a scenario.
@@ -109,12 +118,20 @@ async def post_retrieve_context(
     """
     try:
         logger.info(f"Received context retrieval request: {body.scenario[:50]}...")
+        cached = get_cached_context(body.scenario, body.k_precedents)
+        if cached is not None:
+            response.headers["X-Cache"] = "HIT"
+            return cached
+
         context_data = await retrieve_context(
             scenario=body.scenario,
             k_precedents=body.k_precedents,
             embedder=app.state.embedder,
             jury=app.state.jury,
+            db_pool=app.state.db_pool,
         )
+        cache_context(body.scenario, body.k_precedents, context_data)
+        response.headers["X-Cache"] = "MISS"
         return context_data
     except Exception as e:
         logger.error(f"Context retrieval failed: {str(e)}")
@@ -1,8 +1,13 @@
+import asyncio
 import logging
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from psycopg_pool import ConnectionPool
 
 from .db import Database
-from .models import Jury, Embedder
+from .models import Jury, Embedder, get_embedder, get_jury
 from .config import (
     DB_NAME,
     EMBED_MODEL_NAME,
@@ -10,10 +15,45 @@ from .config import (
     JURY_ADAPTER_PATH,
     EMBEDDING_DIM,
     K_PRECEDENTS,
+    CONTEXT_CACHE_SIZE,
+    CONTEXT_CACHE_TTL,
 )
 
 logger = logging.getLogger(__name__)
 
+# (normalized scenario, k) -> (expiry timestamp, context)
+_context_cache: "OrderedDict[Tuple[str, int], Tuple[float, Dict[str, Any]]]" = (
+    OrderedDict()
+)
+
+
+def _context_cache_key(scenario: str, k_precedents: int) -> Tuple[str, int]:
+    """Normalizes case and whitespace so trivially edited resubmissions share a key."""
+    return " ".join(scenario.split()).casefold(), k_precedents
+
+
+def get_cached_context(scenario: str, k_precedents: int) -> Optional[Dict[str, Any]]:
+    """Returns a previously retrieved context for this scenario, if still fresh."""
+    key = _context_cache_key(scenario, k_precedents)
+    entry = _context_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, context = entry
+    if expires_at < time.monotonic():
+        del _context_cache[key]
+        return None
+    _context_cache.move_to_end(key)
+    return {**context, "scenario": scenario}
+
+
+def cache_context(scenario: str, k_precedents: int, context: Dict[str, Any]) -> None:
+    """Stores a retrieved context, evicting the least recently used entry when full."""
+    key = _context_cache_key(scenario, k_precedents)
+    _context_cache[key] = (time.monotonic() + CONTEXT_CACHE_TTL, context)
+    _context_cache.move_to_end(key)
+    while len(_context_cache) > CONTEXT_CACHE_SIZE:
+        _context_cache.popitem(last=False)
+
 
 async def retrieve_context(
     scenario: str,
@@ -25,27 +65,32 @@ async def retrieve_context(
     k_precedents: int = K_PRECEDENTS,
     embedder: Optional[Embedder] = None,
     jury: Optional[Jury] = None,
+    db_pool: Optional[ConnectionPool] = None,
 ):
     """
     Retrieves precedents and jury consensus for a given scenario.
     """
-    db = Database(dbname=db_name)
+    db = Database(dbname=db_name, pool=db_pool)
     try:
+        # Reuse resident models; loading them per request dominates latency
         if not embedder:
-            embedder = Embedder(model_id=embed_model_name)
+            embedder = get_embedder(embed_model_name)
         if not jury:
-            jury = Jury(model_id=jury_model_id, adapter_path=jury_adapter_path)
-
-        # 1. Vector Search & Retrieval
-        vector = embedder.encode(scenario, dim=embedding_dim)
-        precedents, v_res, k_res, h_rank = db.retrieve_precedents(
-            scenario_vector=vector,
-            keyword_query=scenario,
-            k_precedents=k_precedents,
-        )
+            jury = get_jury(jury_model_id, jury_adapter_path)
+
+        # 1. Embed the scenario for vector search (off the event loop)
+        vector = await asyncio.to_thread(embedder.encode, scenario, dim=embedding_dim)
 
-        # 2. Jury Polling
-        consensus = jury.predict(scenario)
+        # 2. Retrieval & Jury Polling are independent, so run them concurrently
+        precedents, consensus = await asyncio.gather(
+            asyncio.to_thread(
+                db.retrieve_precedents,
+                scenario_vector=vector,
+                keyword_query=scenario,
+                k_precedents=k_precedents,
+            ),
+            asyncio.to_thread(jury.predict, scenario),
+        )
 
         return {"precedents": precedents, "consensus": consensus, "scenario": scenario}
     finally:
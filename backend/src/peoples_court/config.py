@@ -19,11 +19,26 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "")
 DB_PORT = os.getenv("DB_PORT", "5432")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
 
 EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "nomic-ai/nomic-embed-text-v1.5")
 JURY_MODEL_ID = os.getenv("JURY_MODEL_ID", "answerdotai/ModernBERT-large")
 JURY_ADAPTER_PATH = os.getenv("JURY_ADAPTER_PATH", "./models/aita-classifier")
+# Merged + exported Jury for ONNX Runtime; used on CPU when present
+JURY_ONNX_PATH = os.getenv("JURY_ONNX_PATH", "./models/aita-classifier-onnx")
 
 # Adjudication Parameters
 EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
 K_PRECEDENTS = int(os.getenv("K_PRECEDENTS", "3"))
+# Scenarios shorter than this (in tokens) get a uniform jury poll without inference
+JURY_MIN_TOKENS = int(os.getenv("JURY_MIN_TOKENS", "8"))
+# HNSW candidate list size per query; higher improves recall at the cost of latency
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+# Per-model LRU cache of encode/predict results for repeated scenarios
+INFERENCE_CACHE_SIZE = int(os.getenv("INFERENCE_CACHE_SIZE", "1024"))
+
+# In-process cache of full /context results, keyed on the normalized scenario
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "1024"))
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL", "86400"))
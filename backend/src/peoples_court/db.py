@@ -1,161 +1,207 @@
+import numpy as np
 import psycopg
+from pgvector.psycopg import register_vector
+from psycopg_pool import ConnectionPool
 from . import config
-from typing import List, Tuple, Dict, Any, Optional
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Optional
+
+# Characters with meaning in the BM25 query syntax
+_BM25_SANITIZE = str.maketrans({c: " " for c in ':()[]"?*-/\\'})
+
+
+def _connect_kwargs() -> Dict[str, Any]:
+    """Connection parameters shared by direct connections and the pool."""
+    return {
+        "dbname": config.DB_NAME,
+        "user": config.DB_USER,
+        "password": config.DB_PASSWORD,
+        "host": config.DB_HOST,
+        "port": config.DB_PORT,
+    }
+
+
+def _configure_connection(conn: psycopg.Connection) -> None:
+    """Register pgvector types and set per-session search parameters."""
+    register_vector(conn)
+    conn.execute(
+        "SELECT set_config('hnsw.ef_search', %s, false)",
+        (str(config.HNSW_EF_SEARCH),),
+    )
+    # Type lookup opens a transaction; leave the connection idle
+    conn.commit()
+
+
+def create_pool(
+    min_size: int = config.DB_POOL_MIN_SIZE, max_size: int = config.DB_POOL_MAX_SIZE
+) -> ConnectionPool:
+    """Open a pool of warm connections to share across requests."""
+    return ConnectionPool(
+        kwargs=_connect_kwargs(),
+        min_size=min_size,
+        max_size=max_size,
+        configure=_configure_connection,
+        open=True,
+    )
 
 
 class Database:
     """Handle all interactions with the PostgreSQL database, including hybrid search."""
 
-    def __init__(self, dbname: str = "peoples_court"):
+    def __init__(
+        self, dbname: str = "peoples_court", pool: Optional[ConnectionPool] = None
+    ):
         """Initialize database connection parameters."""
         self.dbname = dbname
+        self.pool = pool
         self.conn: Optional[psycopg.Connection] = None
 
     def connect(self) -> psycopg.Connection:
-        """Establish a connection to the database if one doesn't exist."""
+        """Establish a dedicated connection to the database if one doesn't exist."""
         if not self.conn:
-            self.conn = psycopg.connect(
-                dbname=config.DB_NAME,
-                user=config.DB_USER,
-                password=config.DB_PASSWORD,
-                host=config.DB_HOST,
-                port=config.DB_PORT,
-            )
+            self.conn = psycopg.connect(**_connect_kwargs())
+            _configure_connection(self.conn)
         return self.conn
 
     def close(self) -> None:
-        """Safely close the database connection."""
+        """Safely close the dedicated database connection."""
         if self.conn:
             self.conn.close()
             self.conn = None
 
-    def get_cursor(self) -> psycopg.Cursor:
-        """Return a cursor for the current connection."""
-        return self.connect().cursor()
-
-    @staticmethod
-    def rrf_combine(
-        vector_results: List[Tuple[str, float]],
-        keyword_results: List[Tuple[str, float]],
-        k: int = 60,
-        top_rank_bonus: float = 0.01,
-    ) -> List[Tuple[str, float]]:
+    @contextmanager
+    def get_cursor(self) -> Iterator[psycopg.Cursor]:
         """
-        Combine search results using Reciprocal Rank Fusion (RRF) with a top-rank bonus.
-
-        Args:
-            vector_results: List of (id, similarity) from vector search.
-            keyword_results: List of (id, score) from keyword search.
-            k: RRF penalty constant (default 60).
-            top_rank_bonus: Bonus points for documents ranking #1 in either list.
-
-        Returns:
-            Sorted list of (id, rrf_score).
+        Yield a cursor. With a pool, a connection is borrowed for the duration of
+        the block and returned afterwards (committed, or rolled back on error).
         """
-        scores: Dict[str, float] = {}
-        for rank, (sub_id, _) in enumerate(vector_results, start=1):
-            boost = top_rank_bonus if rank == 1 else 0.0
-            scores[sub_id] = scores.get(sub_id, 0.0) + (1.0 / (k + rank)) + boost
-        for rank, (sub_id, _) in enumerate(keyword_results, start=1):
-            boost = top_rank_bonus if rank == 1 else 0.0
-            scores[sub_id] = scores.get(sub_id, 0.0) + (1.0 / (k + rank)) + boost
-        return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        if self.pool is not None:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                yield cur
+        else:
+            with self.connect().cursor() as cur:
+                yield cur
 
     def retrieve_precedents(
-        self, scenario_vector: List[float], keyword_query: str, k_precedents: int = 3
-    ) -> Tuple[List[Dict[str, Any]], List[Tuple], List[Tuple], List[Tuple]]:
+        self,
+        scenario_vector: np.ndarray,
+        keyword_query: str,
+        k_precedents: int = 3,
+        rrf_k: int = 60,
+        top_rank_bonus: float = 0.01,
+    ) -> List[Dict[str, Any]]:
         """
         Perform hybrid search (Vector + BM25) to find relevant cases.
 
+        Both result sets are combined in SQL using Reciprocal Rank Fusion (RRF) with
+        a top-rank bonus, and the winning cases are returned together with their top
+        comments, all in a single round trip.
+
         Args:
             scenario_vector: The embedding vector for the query.
             keyword_query: The raw query string for BM25 search.
             k_precedents: Number of top cases to return.
+            rrf_k: RRF penalty constant (default 60).
+            top_rank_bonus: Bonus points for documents ranking #1 in either list.
 
         Returns:
-            A tuple containing:
-            - precedents (List of Case dicts)
-            - vector_results (Raw vector search results)
-            - keyword_results (Raw keyword search results)
-            - hybrid_rankings (Combined rankings)
+            List of Case dicts, ordered by descending RRF score.
         """
+        # float32 ndarray is dumped with pgvector's binary format, not as text
+        scenario_vector = np.asarray(scenario_vector, dtype=np.float32)
+        # Sanitize the first line for the BM25 query syntax
+        clean_kw = keyword_query.split("\n", 1)[0].strip().translate(_BM25_SANITIZE)
+
+        # Vector candidates are ranked on a half-precision copy of the vectors
+        # (halves the bytes scanned), then rescored at full precision. The verdict
+        # is denormalized onto embeddings so the filter matches the partial HNSW
+        # index and no join is needed.
+        halfvec = f"halfvec({config.EMBEDDING_DIM})"
         with self.get_cursor() as cur:
-            # 1. Vector Search
-            cur.execute(
-                """
-                SELECT e.submission_id, 1 - (e.vector <=> %s::vector) as similarity
-                FROM embeddings e
-                JOIN submissions s ON e.submission_id = s.id
-                WHERE s.verdict IN ('YTA', 'NTA', 'ESH', 'NAH')
-                ORDER BY similarity DESC
-                LIMIT 20
-            """,
-                (scenario_vector,),
-            )
-            vector_results = cur.fetchall()
-
-            # 2. Keyword Search (BM25)
-            # Sanitization logic moved here or kept simple
-            clean_kw = keyword_query.split("\n")[0].strip()
-            for char in [":", "(", ")", "[", "]", '"', "?", "*", "-", "/", "\\"]:
-                clean_kw = clean_kw.replace(char, " ")
-
             cur.execute(
-                """
-                SELECT id, paradedb.score(submissions) as bm25_score
-                FROM submissions
-                WHERE submissions @@@ %s
-                AND verdict IN ('YTA', 'NTA', 'ESH', 'NAH')
-                ORDER BY bm25_score DESC
-                LIMIT 20
+                f"""
+                WITH vec AS (
+                    SELECT submission_id AS id,
+                        row_number() OVER (ORDER BY similarity DESC) AS rank
+                    FROM (
+                        SELECT e.submission_id,
+                            1 - (e.vector <=> %(vector)s::vector) as similarity
+                        FROM embeddings e
+                        WHERE e.verdict IN ('YTA', 'NTA', 'ESH', 'NAH')
+                        ORDER BY e.vector::{halfvec} <=> %(vector)s::{halfvec}
+                        LIMIT 40
+                    ) candidates
+                    ORDER BY similarity DESC
+                    LIMIT 20
+                ),
+                kw AS (
+                    SELECT id, row_number() OVER (ORDER BY bm25_score DESC) AS rank
+                    FROM (
+                        SELECT id, paradedb.score(submissions) as bm25_score
+                        FROM submissions
+                        WHERE submissions @@@ %(bm25_query)s
+                        AND verdict IN ('YTA', 'NTA', 'ESH', 'NAH')
+                        ORDER BY bm25_score DESC
+                        LIMIT 20
+                    ) matches
+                ),
+                fused AS (
+                    SELECT id,
+                        SUM(
+                            1.0 / (%(rrf_k)s + rank)
+                            + CASE WHEN rank = 1 THEN %(top_rank_bonus)s ELSE 0 END
+                        ) AS rrf_score
+                    FROM (
+                        SELECT id, rank FROM vec
+                        UNION ALL
+                        SELECT id, rank FROM kw
+                    ) ranked
+                    GROUP BY id
+                    ORDER BY rrf_score DESC, id
+                    LIMIT %(k_precedents)s
+                )
+                SELECT s.id, s.title, s.selftext, s.link_flair_text, s.score,
+                    f.rrf_score,
+                    COALESCE(
+                        (
+                            SELECT json_agg(
+                                json_build_object(
+                                    'author', c.author, 'body', c.body, 'score', c.score
+                                )
+                                ORDER BY c.score DESC
+                            )
+                            FROM (
+                                SELECT author, body, score FROM comments
+                                WHERE submission_id = s.id
+                                ORDER BY score DESC
+                                LIMIT 3
+                            ) c
+                        ),
+                        '[]'::json
+                    ) AS comments
+                FROM fused f
+                JOIN submissions s ON s.id = f.id
+                ORDER BY f.rrf_score DESC, f.id
             """,
-                (f"title:({clean_kw})^2 OR selftext:({clean_kw})",),
-            )
-            keyword_results = cur.fetchall()
-
-            # Hybrid Rank
-            hybrid_rankings = self.rrf_combine(vector_results, keyword_results)
-            top_ids = [item[0] for item in hybrid_rankings[:k_precedents]]
-
-            if not top_ids:
-                return [], vector_results, keyword_results, hybrid_rankings
-
-            # Fetch Details
-            cur.execute(
-                "SELECT id, title, selftext, link_flair_text, score FROM submissions WHERE id = ANY(%s)",
-                (top_ids,),
-            )
-            subs = {row[0]: row for row in cur.fetchall()}
-
-            # Fetch Comments
-            cur.execute(
-                "SELECT submission_id, author, body, score FROM comments WHERE submission_id = ANY(%s) ORDER BY score DESC",
-                (top_ids,),
+                {
+                    "vector": scenario_vector,
+                    "bm25_query": f"title:({clean_kw})^2 OR selftext:({clean_kw})",
+                    "rrf_k": rrf_k,
+                    "top_rank_bonus": top_rank_bonus,
+                    "k_precedents": k_precedents,
+                },
+                # Same text on every request: parse and plan once per connection
+                prepare=True,
             )
-            comments: Dict[str, List[Dict[str, Any]]] = {}
-            for sub_id, author, body, score in cur.fetchall():
-                if sub_id not in comments:
-                    comments[sub_id] = []
-                if len(comments[sub_id]) < 3:
-                    comments[sub_id].append(
-                        {"author": author, "body": body, "score": score}
-                    )
-
-            precedents = []
-            for sub_id in top_ids:
-                if sub_id in subs:
-                    s = subs[sub_id]
-                    precedents.append(
-                        {
-                            "id": sub_id,
-                            "title": s[1],
-                            "text": s[2],
-                            "verdict": s[3],
-                            "score": s[4],
-                            "relevance_score": next(
-                                score for sid, score in hybrid_rankings if sid == sub_id
-                            ),
-                            "comments": comments.get(sub_id, []),
-                        }
-                    )
-            return precedents, vector_results, keyword_results, hybrid_rankings
+            return [
+                {
+                    "id": sub_id,
+                    "title": title,
+                    "text": text,
+                    "verdict": verdict,
+                    "score": score,
+                    "relevance_score": rrf_score,
+                    "comments": comments,
+                }
+                for sub_id, title, text, verdict, score, rrf_score, comments in cur
+            ]
@@ -1,23 +1,81 @@
+import logging
+import numpy as np
 import torch
 import os
+from functools import lru_cache
+from types import SimpleNamespace
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
 from sentence_transformers import SentenceTransformer
-from typing import Dict, Optional, List
-from .config import EMBED_MODEL_NAME
+from typing import Dict, Optional, List, Tuple
+from .config import (
+    EMBED_MODEL_NAME,
+    JURY_MODEL_ID,
+    JURY_ADAPTER_PATH,
+    JURY_ONNX_PATH,
+    INFERENCE_CACHE_SIZE,
+    JURY_MIN_TOKENS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _select_device() -> str:
+    """Picks the fastest available torch device."""
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def _inference_dtype(device: str) -> torch.dtype:
+    """
+    Half precision on accelerators (bf16 where supported, else fp16) halves the
+    weight bytes moved per layer. CPUs keep fp32.
+    """
+    if device == "cuda":
+        return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+    if device == "mps":
+        return torch.float16
+    return torch.float32
+
+
+# Preferred exported files, int8-quantized first (see data_processing/07_export_onnx.py)
+_ONNX_FILE_NAMES = ("model_quantized.onnx", "model.onnx")
+
+
+class _OnnxClassifier:
+    """
+    Runs an exported sequence classifier with ONNX Runtime behind the same call
+    signature as the PyTorch model: keyword tensors in, an object with `.logits` out.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.input_names = {i.name for i in session.get_inputs()}
+
+    def __call__(self, **inputs: torch.Tensor) -> SimpleNamespace:
+        feeds = {
+            name: tensor.numpy()
+            for name, tensor in inputs.items()
+            if name in self.input_names
+        }
+        (logits,) = self.session.run(["logits"], feeds)
+        return SimpleNamespace(logits=torch.from_numpy(logits))
 
 
 class Jury:
     """Handles pre-deliberation polling using a fine-tuned transformer model."""
 
-    def __init__(self, model_id: str, adapter_path: Optional[str] = None):
-        if torch.cuda.is_available():
-            self.device = "cuda"
-        elif torch.backends.mps.is_available():
-            self.device = "mps"
-        else:
-            self.device = "cpu"
+    def __init__(
+        self,
+        model_id: str,
+        adapter_path: Optional[str] = None,
+        onnx_path: Optional[str] = None,
+    ):
+        self.device = _select_device()
+        self.dtype = _inference_dtype(self.device)
 
-        import logging
         import transformers.utils.logging as tf_logging
 
         tf_logging.set_verbosity_error()
@@ -25,39 +83,131 @@ class Jury:
         logging.getLogger("peft").setLevel(logging.ERROR)
 
         self.tokenizer = AutoTokenizer.from_pretrained(model_id)
-        self.model = AutoModelForSequenceClassification.from_pretrained(
-            model_id, num_labels=4
-        )
-        if adapter_path and os.path.exists(adapter_path):
-            from peft import PeftModel
+        # On CPU, ONNX Runtime's fused graph is several times faster than eager PyTorch
+        self.model = self._load_onnx(onnx_path)
+        if self.model is None:
+            self.model = AutoModelForSequenceClassification.from_pretrained(
+                model_id, num_labels=4
+            )
+            if adapter_path and os.path.exists(adapter_path):
+                from peft import PeftModel
 
-            self.model = PeftModel.from_pretrained(self.model, adapter_path)
+                self.model = PeftModel.from_pretrained(self.model, adapter_path)
 
-        self.model.to(self.device).eval()
+            self.model.to(self.device, dtype=self.dtype).eval()
         self.labels = ["NTA", "YTA", "ESH", "NAH"]
+        # Cached per instance so a reloaded model never serves stale results
+        self._predict_cached = lru_cache(maxsize=INFERENCE_CACHE_SIZE)(self._predict)
+
+    def _load_onnx(self, onnx_path: Optional[str]):
+        """Loads the exported ONNX model for CPU inference, if one is available."""
+        if self.device != "cpu" or not onnx_path or not os.path.isdir(onnx_path):
+            return None
+        file_name = next(
+            (f for f in _ONNX_FILE_NAMES if os.path.exists(os.path.join(onnx_path, f))),
+            None,
+        )
+        if file_name is None:
+            return None
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            logger.warning(
+                "onnxruntime is not installed (uv sync --extra onnx); "
+                "running the Jury in PyTorch."
+            )
+            return None
+
+        logger.info(f"Loading ONNX Jury from {onnx_path}/{file_name}")
+        session = ort.InferenceSession(
+            os.path.join(onnx_path, file_name), providers=["CPUExecutionProvider"]
+        )
+        return _OnnxClassifier(session)
 
     def predict(self, text: str) -> Dict[str, float]:
         """Predicts the probability of each AITA verdict."""
+        return dict(self._predict_cached(text))
+
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Predicts verdict probabilities for many texts in a single forward pass."""
         inputs = self.tokenizer(
-            text, return_tensors="pt", truncation=True, max_length=512
-        ).to(self.device)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
+            texts, return_tensors="pt", padding=True, truncation=True, max_length=512
+        )
+        results = [
+            {label: 1.0 / len(self.labels) for label in self.labels} for _ in texts
+        ]
+        # Too little text for a meaningful poll; those rows keep the uniform prior
+        lengths = inputs["attention_mask"].sum(dim=1).tolist()
+        polled = [i for i, length in enumerate(lengths) if length >= JURY_MIN_TOKENS]
+        if not polled:
+            return results
 
-        return {label: float(prob) for label, prob in zip(self.labels, probs[0])}
+        batch = {key: value[polled].to(self.device) for key, value in inputs.items()}
+        with torch.inference_mode():
+            logits = self.model(**batch).logits
+            # Softmax in fp32 so half-precision logits don't lose resolution
+            probs = torch.nn.functional.softmax(logits.float(), dim=-1).cpu().tolist()
+
+        for i, row in zip(polled, probs):
+            results[i] = dict(zip(self.labels, row))
+        return results
+
+    def _predict(self, text: str) -> Tuple[Tuple[str, float], ...]:
+        return tuple(self.predict_batch([text])[0].items())
 
 
 class Embedder:
     """Handles text embedding using Sentence Transformers."""
 
     def __init__(self, model_id: str = EMBED_MODEL_NAME):
-        self.model = SentenceTransformer(model_id, trust_remote_code=True)
+        device = _select_device()
+        self.model = SentenceTransformer(
+            model_id,
+            device=device,
+            trust_remote_code=True,
+            model_kwargs={"dtype": _inference_dtype(device)},
+        )
+        self._encode_cached = lru_cache(maxsize=INFERENCE_CACHE_SIZE)(self._encode)
 
-    def encode(self, text: str, dim: int = 256) -> List[float]:
-        """Encodes text into a vector, optionally truncating dimensions."""
+    def encode(self, text: str, dim: int = 256) -> np.ndarray:
+        """
+        Encodes text into a float32 vector, optionally truncating dimensions.
+        The array is shared with the cache, so it is read-only.
+        """
+        return self._encode_cached(text, dim)
+
+    def encode_batch(
+        self, texts: List[str], dim: int = 256, batch_size: int = 64
+    ) -> np.ndarray:
+        """
+        Encodes many texts into a (len(texts), dim) float32 array. Sentence
+        Transformers sorts the texts by length so each forward pass pads little.
+        """
+        embeddings = self.model.encode(
+            texts, batch_size=batch_size, convert_to_numpy=True, truncate_dim=dim
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+    def _encode(self, text: str, dim: int) -> np.ndarray:
         # Note: nomic-embed-text-v1.5 supports Matryoshka embeddings
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        if dim < len(embedding):
-            return embedding[:dim].tolist()
-        return embedding.tolist()
+        embedding = self.model.encode(text, convert_to_numpy=True, truncate_dim=dim)
+        # fp16 models yield float16 arrays; pgvector stores float32
+        embedding = embedding.astype(np.float32, copy=False)
+        embedding.setflags(write=False)
+        return embedding
+
+
+@lru_cache(maxsize=None)
+def get_jury(
+    model_id: str = JURY_MODEL_ID,
+    adapter_path: Optional[str] = JURY_ADAPTER_PATH,
+    onnx_path: Optional[str] = JURY_ONNX_PATH,
+) -> Jury:
+    """Returns a process-wide Jury, loading the model on first use."""
+    return Jury(model_id=model_id, adapter_path=adapter_path, onnx_path=onnx_path)
+
+
+@lru_cache(maxsize=None)
+def get_embedder(model_id: str = EMBED_MODEL_NAME) -> Embedder:
+    """Returns a process-wide Embedder, loading the model on first use."""
+    return Embedder(model_id=model_id)
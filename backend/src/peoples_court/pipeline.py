@@ -0,0 +1,25 @@
+import queue
+import threading
+from typing import Generator, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+def prefetch(items: Iterable[T], maxsize: int) -> Generator[T, None, None]:
+    """
+    Produces items on a background thread into a bounded queue, so I/O-bound
+    producers (decompression, database reads) overlap with downstream work.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=maxsize)
+    done = object()
+
+    def produce() -> None:
+        try:
+            for item in items:
+                buffer.put(item)
+        finally:
+            buffer.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while (item := buffer.get()) is not done:
+        yield item
@@ -1,12 +1,15 @@
-import json
-import heapq
+import orjson
 import zstandard as zstd
 import argparse
 import logging
 import os
 import sys
-from typing import Generator, Set, List, Tuple, Dict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Generator, Iterable, Set, List, Tuple
 import psycopg
+from peoples_court.pipeline import prefetch
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,6 +18,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Lines handed to a parse worker at a time, and decoded chunks buffered ahead of them
+PARSE_CHUNK_LINES = 10_000
+PREFETCH_CHUNKS = 64
+
+# Upper bound for zstd long-distance windows (--long=31)
+MAX_WINDOW_SIZE = 1 << 31
+
 BOT_AUTHORS: Set[str] = {
     "AutoModerator",
     "AITA-Bot",
@@ -26,11 +36,37 @@ BOT_AUTHORS: Set[str] = {
 
 REMOVE_MARKERS: Set[str] = {"[removed]", "[deleted]", None, ""}
 
+SUBMISSION_COLUMNS: Tuple[str, ...] = (
+    "id",
+    "author",
+    "title",
+    "selftext",
+    "score",
+    "upvote_ratio",
+    "link_flair_text",
+    "created_utc",
+    "permalink",
+)
+
+COMMENT_COLUMNS: Tuple[str, ...] = (
+    "id",
+    "submission_id",
+    "author",
+    "body",
+    "score",
+    "is_submitter",
+    "parent_id",
+)
+
 
-def stream_zst_lines(file_path: str) -> Generator[str, None, None]:
+def stream_zst_lines(file_path: str) -> Generator[bytes, None, None]:
     """
     Streams decompressed lines from a .zst file without loading the entire file into memory.
-    Uses a larger window size for high-compression Reddit archives and a 16MB buffer.
+    The decoder accepts windows up to 2GB, which high-compression Reddit archives use;
+    zstd still sizes its buffers from each frame header. Reads are 4MB, which stay
+    cache-friendly.
+    Lines are yielded as raw bytes; orjson parses UTF-8 directly, so no decode is needed
+    (and multi-byte characters split across chunk boundaries survive intact).
     """
     if not os.path.exists(file_path):
         logger.error(f"File not found: {file_path}")
@@ -38,73 +74,61 @@ def stream_zst_lines(file_path: str) -> Generator[str, None, None]:
 
     try:
         with open(file_path, "rb") as f:
-            dctx = zstd.ZstdDecompressor(max_window_size=2147483648)
+            dctx = zstd.ZstdDecompressor(max_window_size=MAX_WINDOW_SIZE)
             with dctx.stream_reader(f) as reader:
-                previous_line = ""
+                tail = b""
                 while True:
-                    chunk = reader.read(2**24)  # 16MB chunks
+                    chunk = reader.read(1 << 22)  # 4MB chunks
                     if not chunk:
                         break
 
-                    # Decoded with 'ignore' to handle potential corruption in partial chunks
-                    decoded = previous_line + chunk.decode("utf-8", errors="ignore")
-                    lines = decoded.split("\n")
-                    previous_line = lines[-1]
+                    # Only complete lines are split; the partial last line carries over
+                    idx = chunk.rfind(b"\n")
+                    if idx < 0:
+                        tail += chunk
+                        continue
+                    block = tail + chunk[:idx]
+                    tail = chunk[idx + 1 :]
 
-                    for line in lines[:-1]:
+                    for line in block.split(b"\n"):
                         if line:
                             yield line
+
+                # Archives may not end with a newline
+                if tail:
+                    yield tail
     except Exception as e:
         logger.error(f"Error streaming {file_path}: {e}")
 
 
-def get_existing_ids(cur: psycopg.Cursor) -> Set[str]:
-    """Retrieves all existing submission IDs to prevent duplicate processing."""
-    logger.info("Checking existing submissions in database...")
-    try:
-        cur.execute("SELECT id FROM submissions")
-        return {row[0] for row in cur.fetchall()}
-    except Exception as e:
-        logger.error(f"Failed to fetch existing IDs: {e}")
-        return set()
+def chunk_lines(
+    lines: Iterable[bytes], size: int
+) -> Generator[List[bytes], None, None]:
+    """Groups lines into lists of at most `size` lines."""
+    chunk: List[bytes] = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
-def ingest(
-    submissions_path: str,
-    comments_path: str,
-    db_name: str,
-    min_score: int,
-    batch_size: int,
-):
+def parse_submission_lines(lines: List[bytes], min_score: int) -> List[Tuple]:
     """
-    Two-pass ingestion process:
-    1. Filter and insert submissions based on quality heuristics (score, non-empty, non-bot).
-    2. Stream comments and use min-heaps to keep only the top 3 comments per submission,
-       ensuring we only store high-signal data.
+    Decodes a chunk of submission lines and applies the quality filters
+    (score, non-empty, non-bot). Runs in a worker process.
     """
-    try:
-        conn = psycopg.connect(dbname=db_name)
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        sys.exit(1)
-
-    cur = conn.cursor()
-    existing_ids = get_existing_ids(cur)
-    logger.info(f"Loaded {len(existing_ids)} existing submission IDs.")
-
-    # Pass 1: Submissions
-    logger.info(f"Starting Pass 1: Submissions from {submissions_path}")
     rows: List[Tuple] = []
-    inserted_count = 0
-
-    for line in stream_zst_lines(submissions_path):
+    for line in lines:
         try:
-            data = json.loads(line)
-        except json.JSONDecodeError:
+            data = orjson.loads(line)
+        except orjson.JSONDecodeError:
             continue
 
         sub_id = data.get("id")
-        if not sub_id or sub_id in existing_ids or data.get("score", 0) < min_score:
+        if not sub_id or data.get("score", 0) < min_score:
             continue
 
         # Quality filters: exclude removed/deleted/empty posts and non-self posts
@@ -114,7 +138,6 @@ def ingest(
         if data.get("author") in BOT_AUTHORS:
             continue
 
-        existing_ids.add(sub_id)
         rows.append(
             (
                 sub_id,
@@ -126,86 +149,203 @@ def ingest(
                 data.get("link_flair_text"),
                 data.get("created_utc"),
                 data.get("permalink"),
-                None,  # Placeholder for processed state
             )
         )
+    return rows
+
+
+def parse_comment_lines(lines: List[bytes]) -> List[Tuple]:
+    """
+    Decodes a chunk of comment lines, keeping top-level comments that are not
+    from bots or deleted. Runs in a worker process.
+    """
+    rows: List[Tuple] = []
+    for line in lines:
+        try:
+            data = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            continue
+
+        if data.get("author") in BOT_AUTHORS or data.get("body") in REMOVE_MARKERS:
+            continue
+        # Limit to top-level comments for cleaner "case" data
+        if not str(data.get("parent_id", "")).startswith("t3_"):
+            continue
+
+        rows.append(
+            (
+                data["id"],
+                data.get("link_id", "").replace("t3_", ""),
+                data["author"],
+                data["body"],
+                data.get("score", 0),
+                data.get("is_submitter", False),
+                data.get("parent_id"),
+            )
+        )
+    return rows
+
+
+def parse_in_parallel(
+    file_path: str,
+    parse_chunk: Callable[[List[bytes]], List[Tuple]],
+    workers: int,
+) -> Generator[Tuple, None, None]:
+    """
+    Three-stage pipeline: a thread decompresses and splits lines, a process pool
+    decodes and filters chunks, and the caller consumes rows (and writes to the DB).
+    At most 2 chunks per worker are in flight, keeping memory bounded, and rows are
+    yielded in file order.
+    """
+    chunks = prefetch(
+        chunk_lines(stream_zst_lines(file_path), PARSE_CHUNK_LINES), PREFETCH_CHUNKS
+    )
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(parse_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def create_stage_tables(cur: psycopg.Cursor) -> None:
+    """Creates session-local staging tables shaped like the targets."""
+    for table in ("submissions", "comments"):
+        cur.execute(
+            f"CREATE TEMP TABLE {table}_stage (LIKE {table} INCLUDING DEFAULTS)"
+        )
+
+
+def copy_to_stage(
+    cur: psycopg.Cursor, table: str, columns: Tuple[str, ...], rows: List[Tuple]
+) -> None:
+    """Streams rows into the table's staging table with COPY."""
+    with cur.copy(f"COPY {table}_stage ({', '.join(columns)}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row(row)
+
+
+def copy_via_stage(
+    cur: psycopg.Cursor, table: str, columns: Tuple[str, ...], rows: List[Tuple]
+) -> int:
+    """
+    Streams rows into the staging table with COPY, then merges them into the target,
+    skipping ids that already exist. Returns the number of rows inserted.
+    """
+    stage = f"{table}_stage"
+    copy_to_stage(cur, table, columns, rows)
+    cur.execute(
+        f"INSERT INTO {table} SELECT * FROM {stage} ON CONFLICT (id) DO NOTHING"
+    )
+    inserted = cur.rowcount
+    cur.execute(f"TRUNCATE {stage}")
+    return inserted
+
+
+def get_submission_ids(cur: psycopg.Cursor) -> Set[str]:
+    """
+    Fetches the ids of all stored submissions (those accepted in Pass 1 plus any
+    ingested earlier), so comments on other posts are dropped before staging.
+    """
+    cur.execute("SELECT id FROM submissions")
+    return {row[0] for row in cur}
+
+
+def ingest(
+    submissions_path: str,
+    comments_path: str,
+    db_name: str,
+    min_score: int,
+    batch_size: int,
+    workers: int,
+):
+    """
+    Two-pass ingestion process:
+    1. Filter and insert submissions based on quality heuristics (score, non-empty, non-bot).
+    2. Stream comments on stored submissions into a staging table and keep only the
+       top 3 comments per submission with a window function, ensuring we only store
+       high-signal data.
+    """
+    try:
+        conn = psycopg.connect(dbname=db_name)
+    except Exception as e:
+        logger.error(f"Database connection failed: {e}")
+        sys.exit(1)
+
+    cur = conn.cursor()
+    create_stage_tables(cur)
+
+    # Pass 1: Submissions
+    logger.info(f"Starting Pass 1: Submissions from {submissions_path}")
+    rows: List[Tuple] = []
+    inserted_count = 0
+
+    for row in parse_in_parallel(
+        submissions_path, partial(parse_submission_lines, min_score=min_score), workers
+    ):
+        # Duplicates (in the file or already stored) are skipped by ON CONFLICT
+        rows.append(row)
 
         if len(rows) >= batch_size:
-            cur.executemany(
-                "INSERT INTO submissions VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s) ON CONFLICT (id) DO NOTHING",
-                rows,
+            inserted_count += copy_via_stage(
+                cur, "submissions", SUBMISSION_COLUMNS, rows
             )
             conn.commit()
-            inserted_count += len(rows)
             rows = []
 
     if rows:
-        cur.executemany(
-            "INSERT INTO submissions VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s) ON CONFLICT (id) DO NOTHING",
-            rows,
-        )
+        inserted_count += copy_via_stage(cur, "submissions", SUBMISSION_COLUMNS, rows)
         conn.commit()
-        inserted_count += len(rows)
 
     logger.info(f"Pass 1 Complete. Inserted {inserted_count} new submissions.")
 
     # Pass 2: Comments
     logger.info(f"Starting Pass 2: Comments from {comments_path}")
-    # Stores min-heap of (score, comment_data) per link_id to keep top 3
-    comment_heaps: Dict[str, List[Tuple]] = {}
-
-    for line in stream_zst_lines(comments_path):
-        try:
-            data = json.loads(line)
-        except json.JSONDecodeError:
-            continue
+    # ~140k ids; far smaller than staging every top-level comment in the archive
+    submission_ids = get_submission_ids(cur)
+    rows = []
+    staged_count = 0
 
-        link_id = data.get("link_id", "").replace("t3_", "")
-
-        # Only process comments for submissions we actually ingested (and ignore bots/deleted)
-        if link_id not in existing_ids or data.get("author") in BOT_AUTHORS:
-            continue
-        if data.get("body") in REMOVE_MARKERS:
-            continue
-        # Limit to top-level comments for cleaner "case" data
-        if not str(data.get("parent_id", "")).startswith("t3_"):
+    for comment_data in parse_in_parallel(comments_path, parse_comment_lines, workers):
+        if comment_data[1] not in submission_ids:
             continue
+        rows.append(comment_data)
+        if len(rows) >= batch_size:
+            copy_to_stage(cur, "comments", COMMENT_COLUMNS, rows)
+            staged_count += len(rows)
+            rows = []
 
-        score = data.get("score", 0)
-        heap = comment_heaps.setdefault(link_id, [])
-        comment_data = (
-            data["id"],
-            link_id,
-            data["author"],
-            data["body"],
-            score,
-            data.get("is_submitter", False),
-            data.get("parent_id"),
-        )
-
-        # maintain top 3 via min-heap
-        if len(heap) < 3:
-            heapq.heappush(heap, (score, comment_data))
-        elif score > heap[0][0]:
-            heapq.heapreplace(heap, (score, comment_data))
+    if rows:
+        copy_to_stage(cur, "comments", COMMENT_COLUMNS, rows)
+        staged_count += len(rows)
 
-    logger.info("Truncating old comments and inserting top-filtered comments...")
+    logger.info(
+        f"Staged {staged_count} comments. "
+        "Truncating old comments and inserting top-filtered comments..."
+    )
     try:
         cur.execute("TRUNCATE TABLE comments")
-        conn.commit()
 
-        # Flatten heaps into list of rows
-        comment_rows = [c for h in comment_heaps.values() for s, c in h]
-
-        for i in range(0, len(comment_rows), batch_size):
-            batch = comment_rows[i : i + batch_size]
-            cur.executemany(
-                "INSERT INTO comments VALUES (%s,%s,%s,%s,%s,%s,%s) ON CONFLICT (id) DO NOTHING",
-                batch,
-            )
-            conn.commit()
+        # Keep the top 3 per submission
+        columns = ", ".join(COMMENT_COLUMNS)
+        cur.execute(f"""
+            INSERT INTO comments ({columns})
+            SELECT {columns} FROM (
+                SELECT *, row_number() OVER (
+                    PARTITION BY submission_id ORDER BY score DESC
+                ) AS rn
+                FROM comments_stage
+            ) ranked
+            WHERE rn <= 3
+            ON CONFLICT (id) DO NOTHING
+            """)
+        comment_count = cur.rowcount
+        cur.execute("TRUNCATE comments_stage")
+        conn.commit()
 
-        logger.info(f"Pass 2 Complete. Inserted {len(comment_rows)} comments.")
+        logger.info(f"Pass 2 Complete. Inserted {comment_count} comments.")
     except Exception as e:
         logger.error(f"Failed to insert comments: {e}")
         conn.rollback()
@@ -243,7 +383,13 @@ def main():
         "--batch-size",
         type=int,
         default=5000,
-        help="Database batch insert size",
+        help="Rows per COPY batch",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes used to decode and filter JSON lines",
     )
 
     args = parser.parse_args()
@@ -261,6 +407,7 @@ def main():
         db_name=args.db,
         min_score=args.min_score,
         batch_size=args.batch_size,
+        workers=args.workers,
     )
 
 
@@ -3,8 +3,8 @@ import logging
 import os
 import sys
 import re
-from typing import List, Tuple
-from collections import Counter
+from typing import Dict, List, Tuple
+from collections import defaultdict
 import psycopg
 from psycopg.rows import dict_row
 
@@ -16,21 +16,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# One alternation per canonical judgment; the matching group identifies the label
 JUDGMENT_RE = re.compile(
-    r"\b(YTA|NTA|ESH|NAH|INFO|YWBTA|YWNBTA|NOT THE A-HOLE|YOU'RE THE ASSHOLE)\b",
+    r"\b(?:"
+    r"(YTA|YWBTA|YOU'RE THE A(?:SS|-)HOLE)"
+    r"|(NTA|YWNBTA|NOT THE A-HOLE)"
+    r"|(ESH)"
+    r"|(NAH)"
+    r"|(INFO)"
+    r")\b",
     re.IGNORECASE,
 )
-CANONICAL = {
-    "YTA": "YTA",
-    "NTA": "NTA",
-    "ESH": "ESH",
-    "NAH": "NAH",
-    "INFO": "INFO",
-    "YWBTA": "YTA",
-    "YWNBTA": "NTA",
-    "NOT THE A-HOLE": "NTA",
-    "YOU'RE THE ASSHOLE": "YTA",
-}
+JUDGMENT_LABELS = ("YTA", "NTA", "ESH", "NAH", "INFO")
+JUDGMENT_BY_GROUP = (None, *JUDGMENT_LABELS)
+JUDGMENT_INDEX = {judgment: i for i, judgment in enumerate(JUDGMENT_LABELS)}
 JUNK_FLAIRS = {
     "UPDATE",
     "Update",
@@ -85,6 +84,8 @@ FLAIR_MAPPING = {
     "no a--holes here": "NAH",
     "No A-holes here POO Mode": "NAH",
 }
+# Re-runs only revisit submissions that are new or whose verdict is still unknown
+UNLABELED = "(verdict IS NULL OR verdict = 'UNKNOWN')"
 JUNK_TITLE_KEYWORDS = [
     "UPDATE:",
     "UPDATE -",
@@ -93,19 +94,29 @@ JUNK_TITLE_KEYWORDS = [
     "AWARDS",
     "MONTHLY FORUM",
 ]
+# All keywords in one case-insensitive scan, without upper-casing every title
+JUNK_TITLE_RE = re.compile("|".join(map(re.escape, JUNK_TITLE_KEYWORDS)), re.IGNORECASE)
 
 
 def extract_judgments(text: str) -> List[str]:
     """Extracts canonical AITA judgments from text, handling common variations."""
-    clean_text = text.replace("Not the A-hole", "NTA").replace(
-        "You're the A-hole", "YTA"
+    return [JUDGMENT_BY_GROUP[m.lastindex] for m in JUDGMENT_RE.finditer(text)]
+
+
+def write_verdicts(cur: psycopg.Cursor, updates: List[Tuple]) -> None:
+    """
+    Applies a batch of (verdict, id) updates as a single UPDATE joined against the
+    unnested arrays: one round trip and one plan instead of one statement per row.
+    """
+    verdicts, ids = zip(*updates)
+    cur.execute(
+        """
+        UPDATE submissions AS s SET verdict = v.verdict
+        FROM unnest(%s::text[], %s::text[]) AS v(verdict, id)
+        WHERE s.id = v.id
+        """,
+        (list(verdicts), list(ids)),
     )
-    matches = JUDGMENT_RE.findall(clean_text)
-    return [
-        CANONICAL[m.upper().replace("İ", "I")]
-        for m in matches
-        if m.upper().replace("İ", "I") in CANONICAL
-    ]
 
 
 def label(db_name: str, batch_size: int):
@@ -122,67 +133,104 @@ def label(db_name: str, batch_size: int):
         return
 
     try:
-        cur.execute("SELECT id, title, link_flair_text FROM submissions")
-        submissions = cur.fetchall()
+        cur.execute(f"SELECT count(*) AS total FROM submissions WHERE {UNLABELED}")
+        total = cur.fetchone()["total"]
     except Exception as e:
-        logger.error(f"Failed to fetch submissions: {e}")
+        logger.error(f"Failed to count submissions: {e}")
         cur.close()
         conn.close()
         return
 
-    logger.info(f"Total submissions to analyze: {len(submissions)}")
+    logger.info(f"Total submissions to analyze: {total}")
+
+    # Fetch the top comments for every submission whose flair doesn't settle the
+    # verdict in one streamed query, rather than one query per submission
+    top_comments: Dict[str, List[dict]] = defaultdict(list)
+    try:
+        for row in cur.stream(
+            f"""
+            SELECT submission_id, body, score FROM (
+                SELECT submission_id, body, score,
+                    row_number() OVER (
+                        PARTITION BY submission_id ORDER BY score DESC
+                    ) AS rn
+                FROM comments
+                WHERE is_submitter = FALSE AND submission_id IN (
+                    SELECT id FROM submissions
+                    WHERE {UNLABELED}
+                    AND (link_flair_text IS NULL OR link_flair_text <> ALL(%s))
+                )
+            ) ranked
+            WHERE rn <= 3
+            ORDER BY submission_id, rn
+            """,
+            (list(FLAIR_MAPPING),),
+        ):
+            top_comments[row["submission_id"]].append(row)
+    except Exception as e:
+        logger.error(f"Failed to fetch comments: {e}")
+        conn.rollback()
+
+    # Iterate submissions through a server-side cursor rather than materializing
+    # them all; WITH HOLD keeps it open across the batch commits below
+    try:
+        submissions = conn.cursor(name="label_submissions", withhold=True)
+        submissions.itersize = 10000
+        submissions.execute(
+            f"SELECT id, title, link_flair_text FROM submissions WHERE {UNLABELED}"
+        )
+    except Exception as e:
+        logger.error(f"Failed to fetch submissions: {e}")
+        cur.close()
+        conn.close()
+        return
 
     updated_count = 0
     updates: List[Tuple] = []
 
-    for i, sub in enumerate(submissions):
+    for sub in submissions:
         sub_id = sub["id"]
-        title = (sub["title"] or "").upper()
         flair = sub["link_flair_text"]
 
-        # Filter out junk posts
-        if any(kw in title for kw in JUNK_TITLE_KEYWORDS) or flair in JUNK_FLAIRS:
+        # Filter out junk posts, including verdict-flaired updates and meta posts;
+        # the set lookup short-circuits the title scan for junk flairs
+        if flair in JUNK_FLAIRS or JUNK_TITLE_RE.search(sub["title"] or ""):
             updates.append(("JUNK", sub_id))
         else:
             verdict = FLAIR_MAPPING.get(flair)
             if not verdict:
                 # Fallback to top comment analysis
-                try:
-                    cur.execute(
-                        "SELECT body, score FROM comments WHERE submission_id = %s AND is_submitter = FALSE ORDER BY score DESC LIMIT 3",
-                        (sub_id,),
-                    )
-                    comments = cur.fetchall()
-                except Exception as e:
-                    logger.error(f"Failed to fetch comments for {sub_id}: {e}")
-                    comments = []
-
+                comments = top_comments.get(sub_id, [])
                 if comments:
-                    votes = Counter()
-                    for c in comments:
+                    # Fixed tally slots per judgment; no dict per submission
+                    tallies = [0] * len(JUDGMENT_LABELS)
+                    # Order each judgment first appeared in; comments come
+                    # highest-score first, so ties (common once weights hit the
+                    # cap) go to the top one
+                    first_seen = [len(comments)] * len(JUDGMENT_LABELS)
+                    for order, c in enumerate(comments):
                         comment_judgments = extract_judgments(c["body"])
                         if comment_judgments:
-                            # Weight by score, capped to prevent outliers from dominating
-                            votes[comment_judgments[0]] += max(1, min(c["score"], 500))
+                            idx = JUDGMENT_INDEX[comment_judgments[0]]
+                            first_seen[idx] = min(first_seen[idx], order)
+                            # Weight by score, capped so outliers don't dominate
+                            tallies[idx] += max(1, min(c["score"], 500))
 
-                    if votes:
-                        top_vote = votes.most_common(1)[0][0]
-                        if top_vote in ["YTA", "NTA", "ESH", "NAH", "INFO"]:
-                            verdict = top_vote
+                    top = max(
+                        range(len(tallies)), key=lambda i: (tallies[i], -first_seen[i])
+                    )
+                    if tallies[top]:
+                        verdict = JUDGMENT_LABELS[top]
 
             updates.append((verdict or "UNKNOWN", sub_id))
 
         if len(updates) >= batch_size:
             try:
-                cur.executemany(
-                    "UPDATE submissions SET verdict = %s WHERE id = %s", updates
-                )
+                write_verdicts(cur, updates)
                 conn.commit()
                 updated_count += len(updates)
-                if updated_count % 10000 == 0 or updated_count == len(submissions):
-                    logger.info(
-                        f"  Processed {updated_count}/{len(submissions)} submissions..."
-                    )
+                if updated_count % 10000 == 0 or updated_count == total:
+                    logger.info(f"  Processed {updated_count}/{total} submissions...")
             except Exception as e:
                 logger.error(f"Failed to update batch: {e}")
                 conn.rollback()
@@ -190,15 +238,27 @@ def label(db_name: str, batch_size: int):
 
     if updates:
         try:
-            cur.executemany(
-                "UPDATE submissions SET verdict = %s WHERE id = %s", updates
-            )
+            write_verdicts(cur, updates)
             conn.commit()
             updated_count += len(updates)
         except Exception as e:
             logger.error(f"Failed to update final batch: {e}")
             conn.rollback()
 
+    submissions.close()
+
+    # Keep the verdict denormalized onto embeddings in sync for re-labeled posts
+    try:
+        cur.execute("""
+            UPDATE embeddings e SET verdict = s.verdict
+            FROM submissions s
+            WHERE s.id = e.submission_id AND e.verdict IS DISTINCT FROM s.verdict
+        """)
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Failed to sync embedding verdicts: {e}")
+        conn.rollback()
+
     logger.info(f"Labeling complete. Processed {updated_count} submissions.")
     cur.close()
     conn.close()
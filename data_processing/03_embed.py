@@ -1,10 +1,15 @@
 import argparse
 import logging
 import os
+import queue
 import sys
-from typing import List, Tuple
-from peoples_court.db import Database
+import threading
+from typing import Generator, List, Tuple
+from peoples_court import config
+from psycopg_pool import ConnectionPool
+from peoples_court.db import Database, create_pool
 from peoples_court.models import Embedder
+from peoples_court.pipeline import prefetch
 
 logging.basicConfig(
     level=logging.INFO,
@@ -13,6 +18,69 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Batches buffered between the reader, the encoder and the writer
+PIPELINE_DEPTH = 4
+# One connection per pipeline thread that talks to the database (reader, writer)
+PIPELINE_CONNECTIONS = 2
+
+
+def stream_batches(db: Database, batch_size: int) -> Generator[List[Tuple], None, None]:
+    """Streams submissions with valid verdicts that lack embeddings, in batches."""
+    try:
+        with db.get_cursor() as cur:
+            batch: List[Tuple] = []
+            for row in cur.stream("""
+                SELECT s.id, concat(s.title, E'\\n\\n', s.selftext) AS text, s.verdict
+                FROM submissions s
+                LEFT JOIN embeddings e ON s.id = e.submission_id
+                WHERE e.submission_id IS NULL
+                AND s.verdict IN ('YTA', 'NTA', 'ESH', 'NAH')
+            """):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+    except Exception as e:
+        logger.error(f"Failed to fetch submissions: {e}")
+
+
+def write_batches(
+    pool: ConnectionPool, results: queue.Queue, failed: threading.Event
+) -> None:
+    """
+    Drains (batch, vectors) pairs into the embeddings table until None arrives.
+    If the connection itself fails, sets `failed` and keeps draining the queue so
+    the producer never blocks on it.
+    """
+    written = 0
+    try:
+        with pool.connection() as conn, conn.cursor() as cur:
+            while (item := results.get()) is not None:
+                batch, vectors = item
+                try:
+                    # Binary COPY streams the batch in one go; pgvector sends vectors
+                    # as packed float32. Verdict is copied so vector search can skip
+                    # the join.
+                    with cur.copy(
+                        "COPY embeddings (submission_id, vector, verdict) FROM STDIN WITH (FORMAT BINARY)"
+                    ) as copy:
+                        copy.set_types(["text", "vector", "text"])
+                        for (sub_id, _, verdict), vector in zip(batch, vectors):
+                            copy.write_row((sub_id, vector, verdict))
+                    conn.commit()
+                    written += len(batch)
+                    logger.info(f"  Embedded {written} submissions...")
+                except Exception as e:
+                    logger.error(f"Failed to insert batch: {e}")
+                    conn.rollback()
+    except Exception as e:
+        logger.error(f"Writer stopped: {e}")
+        failed.set()
+        while results.get() is not None:
+            pass
+
 
 def embed(
     db_name: str,
@@ -23,76 +91,53 @@ def embed(
     """
     Fetches submissions with valid verdicts that lack embeddings,
     encodes them using the specified model, and stores the vectors.
+
+    Runs as a pipeline so the database never waits on the model or vice versa:
+    a reader thread streams batches from the server, the main thread encodes
+    them, and a writer thread COPYs the results. Each thread borrows its own
+    connection from a pool sized to match.
     """
-    db = Database(dbname=db_name)
     try:
         embedder = Embedder(model_id=model_name)
     except Exception as e:
         logger.error(f"Failed to initialize embedder: {e}")
         return
 
+    # Separate connections: committing writes must not close the reader's stream.
+    # The pool opens both concurrently and shares the pgvector session setup.
+    pool = create_pool(min_size=PIPELINE_CONNECTIONS, max_size=PIPELINE_CONNECTIONS)
     try:
-        conn = db.connect()
-        cur = conn.cursor()
+        pool.wait()
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
+        pool.close()
         return
+    reader_db = Database(dbname=db_name, pool=pool)
 
-    logger.info("Fetching submissions without embeddings...")
-    try:
-        cur.execute("""
-            SELECT s.id, s.title, s.selftext 
-            FROM submissions s
-            LEFT JOIN embeddings e ON s.id = e.submission_id
-            WHERE e.submission_id IS NULL
-            AND s.verdict IN ('YTA', 'NTA', 'ESH', 'NAH')
-        """)
-        rows = cur.fetchall()
-    except Exception as e:
-        logger.error(f"Failed to fetch submissions: {e}")
-        db.close()
-        return
-
-    total_rows = len(rows)
-    logger.info(f"Total to embed: {total_rows}")
+    logger.info("Streaming submissions without embeddings...")
+    results: queue.Queue = queue.Queue(maxsize=PIPELINE_DEPTH)
+    writer_failed = threading.Event()
+    writer = threading.Thread(target=write_batches, args=(pool, results, writer_failed))
+    writer.start()
 
-    updates: List[Tuple] = []
-    for i, (sub_id, title, text) in enumerate(rows):
-        full_text = f"{title}\n\n{text}"
-        try:
-            vector = embedder.encode(full_text, dim=dim)
-            updates.append((sub_id, vector))
-        except Exception as e:
-            logger.error(f"Failed to encode submission {sub_id}: {e}")
-            continue
-
-        if len(updates) >= batch_size:
+    try:
+        for batch in prefetch(stream_batches(reader_db, batch_size), PIPELINE_DEPTH):
+            if writer_failed.is_set():
+                logger.error("Embeddings can no longer be written; stopping.")
+                break
             try:
-                cur.executemany(
-                    "INSERT INTO embeddings (submission_id, vector) VALUES (%s, %s)",
-                    updates,
-                )
-                conn.commit()
-                updates = []
-                logger.info(f"  Embedded {i + 1}/{total_rows}...")
+                # One batched forward pass per slice instead of one per submission
+                vectors = embedder.encode_batch([text for _, text, _ in batch], dim=dim)
             except Exception as e:
-                logger.error(f"Failed to insert batch: {e}")
-                conn.rollback()
-                updates = []
-
-    if updates:
-        try:
-            cur.executemany(
-                "INSERT INTO embeddings (submission_id, vector) VALUES (%s, %s)",
-                updates,
-            )
-            conn.commit()
-        except Exception as e:
-            logger.error(f"Failed to insert final batch: {e}")
-            conn.rollback()
+                logger.error(f"Failed to encode batch: {e}")
+                continue
+            results.put((batch, vectors))
+    finally:
+        results.put(None)
+        writer.join()
+        pool.close()
 
     logger.info("Embedding process complete.")
-    db.close()
 
 
 def main():
@@ -101,18 +146,18 @@ def main():
     )
     parser.add_argument(
         "--db",
-        default=os.getenv("DB_NAME", "peoples_court"),
+        default=config.DB_NAME,
         help="PostgreSQL database name",
     )
     parser.add_argument(
         "--model",
-        default=os.getenv("EMBED_MODEL_NAME", "nomic-ai/nomic-embed-text-v1.5"),
+        default=config.EMBED_MODEL_NAME,
         help="Embedding model name",
     )
     parser.add_argument(
         "--dim",
         type=int,
-        default=int(os.getenv("EMBEDDING_DIM", "256")),
+        default=config.EMBEDDING_DIM,
         help="Embedding dimensions",
     )
     parser.add_argument(
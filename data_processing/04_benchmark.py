@@ -1,8 +1,8 @@
 import argparse
 import logging
-import os
 import sys
 import time
+from peoples_court import config
 from peoples_court.db import Database
 
 logging.basicConfig(
@@ -36,20 +36,24 @@ def run_benchmark(
             row = cur.fetchone()
             sample_vector = row[0] if row else None
 
-            if not sample_vector:
+            if sample_vector is None:
                 logger.warning("No vectors found in DB. Vector benchmark skipped.")
             else:
                 # 1. Vector Search Benchmark
                 logger.info(f"1. Benchmarking Vector Search (Top {limit})...")
                 start = time.time()
+                # Order by the distance expression itself (not the similarity alias),
+                # matching the partial halfvec HNSW index so it can serve the top-k
+                halfvec = f"halfvec({config.EMBEDDING_DIM})"
                 cur.execute(
-                    """
-                    SELECT submission_id, 1 - (vector <=> %s::vector) as similarity 
-                    FROM embeddings 
-                    ORDER BY similarity DESC 
-                    LIMIT %s
+                    f"""
+                    SELECT submission_id, 1 - (vector <=> %(vector)s::vector) as similarity
+                    FROM embeddings
+                    WHERE verdict IN ('YTA', 'NTA', 'ESH', 'NAH')
+                    ORDER BY vector::{halfvec} <=> %(vector)s::{halfvec}
+                    LIMIT %(limit)s
                     """,
-                    (sample_vector, limit),
+                    {"vector": sample_vector, "limit": limit},
                 )
                 results = cur.fetchall()
                 duration = time.time() - start
@@ -89,7 +93,7 @@ def main():
     )
     parser.add_argument(
         "--db",
-        default=os.getenv("DB_NAME", "peoples_court"),
+        default=config.DB_NAME,
         help="PostgreSQL database name",
     )
     parser.add_argument(
@@ -2,7 +2,7 @@ import argparse
 import logging
 import os
 import sys
-import json
+import orjson
 import random
 from typing import List, Dict
 import psycopg
@@ -17,8 +17,8 @@ logger = logging.getLogger(__name__)
 
 def gen_dataset(db_name: str, output_file: str, target_max: int):
     """
-    Fetches submissions with valid verdicts, balances the classes up to target_max,
-    and writes the resulting dataset to a JSONL file.
+    Samples submissions with valid verdicts, balancing the classes up to target_max
+    in SQL, and writes the resulting dataset to a JSONL file.
     """
     try:
         conn = psycopg.connect(dbname=db_name)
@@ -26,40 +26,46 @@ def gen_dataset(db_name: str, output_file: str, target_max: int):
         logger.error(f"Database connection failed: {e}")
         return
 
-    cur = conn.cursor()
+    # Server-side cursor: rows arrive in chunks instead of one giant result set
+    cur = conn.cursor(name="training_submissions")
+    cur.itersize = 10000
 
-    logger.info("Fetching submissions...")
+    logger.info("Sampling submissions...")
     try:
+        # Postgres samples up to target_max rows per verdict, so only the sampled
+        # rows cross the wire
         cur.execute(
-            "SELECT title, selftext, verdict FROM submissions WHERE verdict IN ('YTA', 'NTA', 'ESH', 'NAH') AND selftext NOT IN ('[removed]', '[deleted]', '', ' ')"
+            """
+            SELECT title, selftext, verdict FROM (
+                SELECT title, selftext, verdict,
+                    row_number() OVER (PARTITION BY verdict ORDER BY random()) AS rn
+                FROM submissions
+                WHERE verdict IN ('YTA', 'NTA', 'ESH', 'NAH')
+                AND selftext NOT IN ('[removed]', '[deleted]', '', ' ')
+            ) sampled
+            WHERE rn <= %s
+            """,
+            (target_max,),
         )
-        rows = cur.fetchall()
+        final_data: List[Dict] = [
+            {"text": f"{title}\n\n{selftext}", "label": verdict}
+            for title, selftext, verdict in cur
+        ]
     except Exception as e:
         logger.error(f"Failed to fetch submissions: {e}")
         cur.close()
         conn.close()
         return
 
-    data_by_class: Dict[str, List[Dict]] = {"YTA": [], "NTA": [], "ESH": [], "NAH": []}
-    for title, selftext, verdict in rows:
-        data_by_class[verdict].append(
-            {"text": f"{title}\n\n{selftext}", "label": verdict}
-        )
-
-    final_data: List[Dict] = []
-    for label in ["YTA", "NTA", "ESH", "NAH"]:
-        items = data_by_class[label]
-        if len(items) > target_max:
-            items = random.sample(items, target_max)
-        final_data.extend(items)
-
     random.shuffle(final_data)
 
     logger.info(f"Writing {len(final_data)} samples to {output_file}...")
     try:
-        with open(output_file, "w") as f:
+        # orjson emits UTF-8 bytes directly; the 1MB buffer batches the writes
+        with open(output_file, "wb", buffering=1 << 20) as f:
             for entry in final_data:
-                f.write(json.dumps(entry) + "\n")
+                f.write(orjson.dumps(entry))
+                f.write(b"\n")
     except Exception as e:
         logger.error(f"Failed to write output file: {e}")
 
@@ -0,0 +1,115 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from peoples_court import config
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    handlers=[logging.StreamHandler(sys.stdout)],
+)
+logger = logging.getLogger(__name__)
+
+
+def export(
+    model_id: str,
+    adapter_path: str,
+    output_dir: str,
+    quantize: str,
+):
+    """
+    Merges the LoRA adapter into the base model and exports it to ONNX for CPU
+    inference with ONNX Runtime, optionally with int8 dynamic quantization.
+
+    Args:
+        model_id: Base model the adapter was trained on.
+        adapter_path: Directory containing the trained LoRA adapter.
+        output_dir: Directory to write the ONNX model and tokenizer to.
+        quantize: Target instruction set for int8 quantization, or "none".
+    """
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    except ImportError:
+        # Not in the lockfile: optimum pins an older transformers than the backend
+        logger.error(
+            'Exporting requires optimum: uv run --with "optimum[onnxruntime]" '
+            "data_processing/07_export_onnx.py"
+        )
+        sys.exit(1)
+
+    from peft import PeftModel
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    if not os.path.exists(adapter_path):
+        logger.error(f"Adapter not found: {adapter_path}")
+        sys.exit(1)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+
+    logger.info(f"Merging adapter {adapter_path} into {model_id}...")
+    base = AutoModelForSequenceClassification.from_pretrained(model_id, num_labels=4)
+    merged = PeftModel.from_pretrained(base, adapter_path).merge_and_unload()
+
+    with tempfile.TemporaryDirectory() as merged_dir:
+        merged.save_pretrained(merged_dir)
+        tokenizer.save_pretrained(merged_dir)
+
+        logger.info("Exporting to ONNX...")
+        ort_model = ORTModelForSequenceClassification.from_pretrained(
+            merged_dir, export=True
+        )
+        ort_model.save_pretrained(output_dir)
+        tokenizer.save_pretrained(output_dir)
+
+    if quantize != "none":
+        logger.info(f"Quantizing to int8 ({quantize})...")
+        qconfig = getattr(AutoQuantizationConfig, quantize)(
+            is_static=False, per_channel=False
+        )
+        ORTQuantizer.from_pretrained(output_dir).quantize(
+            save_dir=output_dir, quantization_config=qconfig
+        )
+
+    logger.info(f"Export complete: {output_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the Jury classifier to ONNX for CPU inference."
+    )
+    parser.add_argument(
+        "--model",
+        default=config.JURY_MODEL_ID,
+        help="Base model ID",
+    )
+    parser.add_argument(
+        "--adapter",
+        default=config.JURY_ADAPTER_PATH,
+        help="Path to the trained LoRA adapter",
+    )
+    parser.add_argument(
+        "--output",
+        default=config.JURY_ONNX_PATH,
+        help="Output directory for the ONNX model",
+    )
+    parser.add_argument(
+        "--quantize",
+        choices=["arm64", "avx2", "avx512", "avx512_vnni", "none"],
+        default="arm64",
+        help="Instruction set for int8 dynamic quantization (arm64 for Ampere VPS)",
+    )
+
+    args = parser.parse_args()
+    export(
+        model_id=args.model,
+        adapter_path=args.adapter,
+        output_dir=args.output,
+        quantize=args.quantize,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,48 @@ export const runtime = "edge";
 const rateLimitMap = new Map<string, { count: number; lastReset: number }>();
 const RATE_LIMIT = 3; // requests
 const WINDOW_MS = 60 * 1000; // 1 minute
+const STREAM_FLUSH_MS = Number(process.env.STREAM_FLUSH_MS ?? 30); // ms per frame
+
+// Built once per isolate rather than on every request
+const JUDGE_RESPONSE_SCHEMA = z.object({
+  verdict: z.enum(["YTA", "NTA", "ESH", "NAH"]),
+  explanation: z.string(),
+  precedents: z.array(
+    z.object({
+      case_id: z.string(),
+      case_name: z.string(),
+      comparison: z.string(),
+    }),
+  ),
+});
+
+// Invariant instructions for the Judge, built once per isolate. Kept as the
+// leading part of the prompt so the provider can reuse the common prefix.
+const JUDGE_INSTRUCTIONS = `You are the presiding Judicial Officer of 'The People's Court'. You are hereby directed to render a final disposition in the instant matter, articulated in 3-4 concise, authoritative sentences employing appropriate legal vocabulary. Sprinkle in some Latin if relevant.
+
+Mandatory Instructions:
+1. Disposition: Must be rendered as one of the following: YTA, NTA, ESH, NAH.
+2. Determination: Issue a succinct judicial opinion explaining the Court's reasoning. You are REQUIRED to cite controlling precedent by 'case_name' as set forth in the record below.
+3. Precedents: For each matter of binding precedent provided in the evidentiary record, you shall craft a 2-3 sentence 'comparison' and assign a unique, dryly sardonic 'case_name' that references material facts or circumstances of said precedent.
+
+Precedent Analysis Guidelines:
+- The Court shall not merely recite or summarize the facts of the precedent.
+- You MUST articulate, with particularity, how the legal principles, moral considerations, or social norms established in the cited precedent bear upon—or distinguish from—the material facts of the instant grievance.
+- Focus on the ratio decidendi and underlying equitable principles.
+- When drafting your comparison, do NOT reference the technical case_id (e.g., "qdlhvp"). Instead, use natural legal phrasing such as "in this case," "this matter," "the present precedent," "herein," or similar flowing language.
+- CRITICAL: Under no circumstances shall single or double quotation marks be placed around the 'case_name' in ANY portion of your written determination (neither in the Disposition nor in Precedent Comparisons). The case name shall be stated plainly to facilitate proper citation linkage.`;
+
+// One provider model instance shared by every request
+const JUDGE_MODEL = google("gemini-2.5-flash-lite");
+
+// The Jury always polls the same four verdicts, in the classifier's label order
+const JURY_LABELS = ["NTA", "YTA", "ESH", "NAH"] as const;
+
+function formatJuryPolling(consensus: Record<string, number>): string {
+  return JURY_LABELS.map(
+    (label) => `- ${label}: ${((consensus[label] ?? 0) * 100).toFixed(2)}%\n`,
+  ).join("");
+}
 
 export async function POST(req: Request) {
   try {
@@ -120,25 +162,30 @@ export async function POST(req: Request) {
           const { precedents, consensus } = await contextResponse.json();
 
           // 2. Build Context for Judge
-          let contextText =
-            "### CURRENT EVIDENCE PROVIDED BY THE PLAINTIFF:\n\n";
-          contextText += scenario + "\n\n";
-          contextText += "### PRE-DELIBERATION JURY POLLING:\n";
-          Object.entries(consensus).forEach(([label, prob]) => {
-            contextText += `- ${label}: ${((prob as number) * 100).toFixed(2)}%\n`;
-          });
-          contextText += "\n";
-          contextText += "### RELEVANT CASE LAW (PRECEDENTS):\n\n";
+          const contextParts: string[] = [
+            "### CURRENT EVIDENCE PROVIDED BY THE PLAINTIFF:\n\n",
+            scenario,
+            "\n\n",
+            "### PRE-DELIBERATION JURY POLLING:\n",
+            formatJuryPolling(consensus),
+            "\n",
+            "### RELEVANT CASE LAW (PRECEDENTS):\n\n",
+          ];
           precedents.forEach((p: any, i: number) => {
-            contextText += `CASE ${i + 1}: ID \`${p.id}\` - Title: ${p.title}\n`;
-            contextText += `Official Reddit Verdict: ${p.verdict}\n`;
-            contextText += `Facts: ${p.text.substring(0, 1000)}...\n`;
-            contextText += "Top Judgments from the Jury:\n";
+            contextParts.push(
+              `CASE ${i + 1}: ID \`${p.id}\` - Title: ${p.title}\n`,
+              `Official Reddit Verdict: ${p.verdict}\n`,
+              `Facts: ${p.text.substring(0, 1000)}...\n`,
+              "Top Judgments from the Jury:\n",
+            );
             p.comments?.forEach((c: any) => {
-              contextText += `- ${c.author} (Score ${c.score}): ${c.body.substring(0, 200)}...\n`;
+              contextParts.push(
+                `- ${c.author} (Score ${c.score}): ${c.body.substring(0, 200)}...\n`,
+              );
             });
-            contextText += "\n---\n";
+            contextParts.push("\n---\n");
           });
+          const contextText = contextParts.join("");
 
           // 3. Adjudicate with Gemini (Stream Object for robust JSON)
           writer.write({
@@ -146,58 +193,43 @@ export async function POST(req: Request) {
             data: { status: "The Judge is deliberating..." },
           });
 
-          const { partialObjectStream } = await streamObject({
-            model: google("gemini-2.5-flash-lite"),
-            schema: z.object({
-              verdict: z.enum(["YTA", "NTA", "ESH", "NAH"]),
-              explanation: z.string(),
-              precedents: z.array(
-                z.object({
-                  case_id: z.string(),
-                  case_name: z.string(),
-                  comparison: z.string(),
-                }),
-              ),
-            }),
-            prompt: `
-              You are the presiding Judicial Officer of 'The People's Court'. You are hereby directed to render a final disposition in the instant matter, articulated in 3-4 concise, authoritative sentences employing appropriate legal vocabulary. Sprinkle in some Latin if relevant.
-              
-              Mandatory Instructions:
-              1. Disposition: Must be rendered as one of the following: YTA, NTA, ESH, NAH.
-              2. Determination: Issue a succinct judicial opinion explaining the Court's reasoning. You are REQUIRED to cite controlling precedent by 'case_name' as set forth in the record below.
-              3. Precedents: For each matter of binding precedent provided in the evidentiary record, you shall craft a 2-3 sentence 'comparison' and assign a unique, dryly sardonic 'case_name' that references material facts or circumstances of said precedent. 
-              
-              Precedent Analysis Guidelines:
-              - The Court shall not merely recite or summarize the facts of the precedent.
-              - You MUST articulate, with particularity, how the legal principles, moral considerations, or social norms established in the cited precedent bear upon—or distinguish from—the material facts of the instant grievance.
-              - Focus on the ratio decidendi and underlying equitable principles.
-              - When drafting your comparison, do NOT reference the technical case_id (e.g., "qdlhvp"). Instead, use natural legal phrasing such as "in this case," "this matter," "the present precedent," "herein," or similar flowing language.
-              - CRITICAL: Under no circumstances shall single or double quotation marks be placed around the 'case_name' in ANY portion of your written determination (neither in the Disposition nor in Precedent Comparisons). The case name shall be stated plainly to facilitate proper citation linkage.
-              
-              ${contextText}
-            `,
+          const { partialObjectStream, object } = await streamObject({
+            model: JUDGE_MODEL,
+            schema: JUDGE_RESPONSE_SCHEMA,
+            prompt: `${JUDGE_INSTRUCTIONS}\n\n${contextText}`,
           });
 
-          // Loop through the object stream and emit tokens for the custom parser
+          // Loop through the object stream and emit tokens for the custom parser,
+          // coalescing deltas so each SSE frame carries a batch of tokens
           let lastFullString = "";
           let textStreamStarted = false;
+          let pendingDelta = "";
+          let lastFlush = Date.now();
+
+          const flushDelta = () => {
+            if (!pendingDelta) return;
+            if (!textStreamStarted) {
+              writer.write({ type: "text-start", id: "adjudication" });
+              textStreamStarted = true;
+            }
+            writer.write({
+              type: "text-delta",
+              id: "adjudication",
+              delta: pendingDelta,
+            });
+            pendingDelta = "";
+            lastFlush = Date.now();
+          };
 
           for await (const partialObject of partialObjectStream) {
             const currentString = JSON.stringify(partialObject);
-            const delta = currentString.slice(lastFullString.length);
-            if (delta) {
-              if (!textStreamStarted) {
-                writer.write({ type: "text-start", id: "adjudication" });
-                textStreamStarted = true;
-              }
-              writer.write({
-                type: "text-delta",
-                id: "adjudication",
-                delta: delta,
-              });
-            }
+            pendingDelta += currentString.slice(lastFullString.length);
             lastFullString = currentString;
+            if (Date.now() - lastFlush >= STREAM_FLUSH_MS) {
+              flushDelta();
+            }
           }
+          flushDelta();
 
           if (textStreamStarted) {
             writer.write({ type: "text-end", id: "adjudication" });
@@ -205,7 +237,8 @@ export async function POST(req: Request) {
 
           // Final Enrichment
           try {
-            const finalObject = JSON.parse(lastFullString);
+            // Schema-validated result from the SDK; avoids re-parsing the streamed text
+            const finalObject = await object;
             const dbMap = new Map(precedents.map((p: any) => [p.id, p]));
             const enrichedPrecedents = finalObject.precedents.map(
               (cite: any) => {